@@ -1,79 +1,316 @@
 from kafka import KafkaConsumer
-import pandas as pd
-import json
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import orjson
 import os
+import sys
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-def consume_kafka_to_parquet(topic_name, bootstrap_servers, output_directory, batch_size=1000):
+# Fixed schema of the cleaned transaction records (same fields as TransactionSerializer)
+TRANSACTION_SCHEMA = pa.schema([
+    ('TRANSACTION_ID', pa.string()),
+    ('TIMESTAMP', pa.timestamp('us', tz='UTC')),
+    ('USER_ID', pa.string()),
+    ('USER_NAME', pa.string()),
+    ('PRODUCT_ID', pa.string()),
+    ('AMOUNT_USD', pa.float64()),
+    ('CURRENCY', pa.string()),
+    ('TRANSACTION_TYPE', pa.string()),
+    ('STATUS', pa.string()),
+    ('LOCATION_CITY', pa.string()),
+    ('LOCATION_COUNTRY', pa.string()),
+    ('PAYMENT_METHOD', pa.string()),
+    ('PRODUCT_CATEGORY', pa.string()),
+    ('QUANTITY', pa.int64()),
+    ('SHIPPING_STREET', pa.string()),
+    ('SHIPPING_ZIP', pa.string()),
+    ('SHIPPING_CITY', pa.string()),
+    ('SHIPPING_COUNTRY', pa.string()),
+    ('DEVICE_OS', pa.string()),
+    ('DEVICE_BROWSER', pa.string()),
+    ('DEVICE_IP_ADDRESS', pa.string()),
+    ('CUSTOMER_RATING', pa.float64()),
+    ('DISCOUNT_CODE', pa.string()),
+    ('TAX_AMOUNT', pa.float64()),
+    ('THREAD', pa.int64()),
+    ('MESSAGE_NUMBER', pa.int64()),
+    ('TIMESTAMP_OF_RECEPTION_LOG', pa.timestamp('us')),
+])
+
+# Known string formats of the timestamp columns (None means ISO-8601)
+TIMESTAMP_FORMATS = {
+    'TIMESTAMP': None,
+    'TIMESTAMP_OF_RECEPTION_LOG': '%d/%m/%Y %H:%M:%S',
+}
+
+# Dictionary encoding suits the low-cardinality columns (CURRENCY, STATUS, DEVICE_OS, ...),
+# statistics let readers skip row groups
+PARQUET_WRITE_OPTIONS = {
+    'compression': 'zstd',
+    'compression_level': 3,
+    'use_dictionary': True,
+    'dictionary_pagesize_limit': 1 << 20,
+    'data_page_size': 1 << 20,
+    'write_statistics': True,
+}
+
+# Completed batches waiting for the background writer, bounds the memory held by a slow disk
+MAX_PENDING_BATCHES = 4
+
+# Messages between two throughput reports
+PROGRESS_INTERVAL = 10_000
+
+
+class RollingParquetWriter:
+    """
+    Append batches to a single open Parquet file, rolling to a new file once it grows
+    past max_file_bytes or has been open for max_file_age seconds
+    """
+
+    def __init__(self, output_directory, topic_name, schema, worker_id=0,
+                 max_file_bytes=128 << 20, max_file_age=60):
+        self.directory = os.path.join(output_directory, topic_name)
+        self.topic_name = topic_name
+        self.schema = schema
+        self.worker_id = worker_id
+        self.max_file_bytes = max_file_bytes
+        self.max_file_age = max_file_age
+        self.file_counter = 0
+        self.writer = None
+        self.path = None
+        self.opened_at = None
+        self.bytes_written = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def write(self, batch):
+        """Append a record batch to the current file, opening a new one if needed"""
+        if self.writer is None:
+            self.open()
+
+        self.writer.write_batch(batch)
+        self.bytes_written = self.writer.file_handle.tell()
+        return self.path
+
+    def open(self):
+        self.file_counter += 1
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.path = os.path.join(self.directory, f"{self.topic_name}_part_{self.worker_id}_{self.file_counter}_{timestamp}.parquet")
+        # Write under a hidden name so readers never pick up a file without its footer
+        writer = pq.ParquetWriter(self.in_progress_path(), self.schema, **PARQUET_WRITE_OPTIONS)
+        # Runs on the background writer thread, the state read by is_due() is set before the writer is published
+        self.opened_at = time.monotonic()
+        self.bytes_written = 0
+        self.writer = writer
+
+    def in_progress_path(self):
+        return os.path.join(self.directory, f".{os.path.basename(self.path)}.inprogress")
+
+    def is_due(self):
+        """Whether the open file should be finalized"""
+        if self.writer is None:
+            return False
+        return (self.bytes_written >= self.max_file_bytes
+                or time.monotonic() - self.opened_at >= self.max_file_age)
+
+    def close(self):
+        """Finalize the open file and publish it under its final name"""
+        if self.writer is None:
+            return False
+        self.writer.close()
+        os.replace(self.in_progress_path(), self.path)
+        print(f"Closed Parquet file: {self.path}")
+        self.writer = None
+        return True
+
+
+class BackgroundBatchWriter:
+    """
+    Convert and write batches on a background thread so that consuming from Kafka
+    continues while a batch is serialized and written to disk
+    """
+
+    def __init__(self, writer, max_pending=MAX_PENDING_BATCHES):
+        self.writer = writer
+        # A single thread, the ParquetWriter is not thread-safe and batches must stay in order
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='parquet-writer')
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.pending = []
+
+    def submit(self, columns):
+        """Queue a batch for writing, blocking while max_pending batches are already queued"""
+        self.slots.acquire()
+        future = self.executor.submit(save_parquet_batch, columns, self.writer)
+        future.add_done_callback(lambda _: self.slots.release())
+
+        # Drop finished writes, re-raising the error of a failed one
+        for done in [f for f in self.pending if f.done()]:
+            done.result()
+            self.pending.remove(done)
+        self.pending.append(future)
+
+    def wait(self):
+        """Block until every queued batch is written, re-raising write errors"""
+        pending, self.pending = self.pending, []
+        for future in pending:
+            future.result()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+def consume_kafka_to_parquet(topic_name, bootstrap_servers, output_directory, batch_size=1000,
+                             schema=TRANSACTION_SCHEMA, worker_id=0):
     """
     Consume Kafka messages and save to Parquet files in batches
     """
-    os.makedirs(output_directory, exist_ok=True)
+    writer = RollingParquetWriter(output_directory, topic_name, schema, worker_id=worker_id)
+    background_writer = BackgroundBatchWriter(writer)
     
     consumer = KafkaConsumer(
         topic_name,
         bootstrap_servers=bootstrap_servers,
         auto_offset_reset='earliest',
-        enable_auto_commit=True,
+        enable_auto_commit=False,
         group_id='parquet-consumer-group',
-        value_deserializer=lambda x: x.decode('utf-8') if x else None
+        # Let each fetch return up to a whole batch instead of many small responses
+        fetch_min_bytes=1 << 20,
+        fetch_max_wait_ms=500,
+        max_partition_fetch_bytes=4 << 20,
+        max_poll_records=batch_size
     )
     
-    transactions = []
-    file_counter = 1
+    columns = new_batch(schema)  # Column-oriented batch: column name -> values
+    row_count = 0
     total_messages = 0
+    last_report_time = time.monotonic()
+    last_report_count = 0
     
     try:
-        print(f"Starting to consume from topic '{topic_name}' and save to Parquet...")
+        print(f"Worker {worker_id}: starting to consume from topic '{topic_name}' and save to Parquet...")
         
-        for message in consumer:
-            if message.value:
-                # Parse JSON transaction
-                transaction = json.loads(message.value)
-                transactions.append(transaction)
-                total_messages += 1
-                
-                # Save batch when we reach batch_size
-                if len(transactions) >= batch_size:
-                    save_parquet_batch(transactions, output_directory, topic_name, file_counter)
-                    transactions = []  # Reset for next batch
-                    file_counter += 1
-                    
-                if total_messages % 100 == 0:
-                    print(f"Processed {total_messages} messages...")
-                    
+        while True:
+            # Fetch up to batch_size records at once instead of iterating message by message
+            batches = consumer.poll(timeout_ms=500, max_records=batch_size)
+
+            for tp, records in batches.items():
+                for message in records:
+                    if message.value:
+                        # Parse JSON transaction straight from the raw bytes
+                        transaction = orjson.loads(message.value)
+                        for name, values in columns.items():
+                            values.append(transaction.get(name))
+                        row_count += 1
+                        total_messages += 1
+
+                        if total_messages - last_report_count >= PROGRESS_INTERVAL:
+                            now = time.monotonic()
+                            rate = (total_messages - last_report_count) / (now - last_report_time)
+                            sys.stderr.write(f"Worker {worker_id}: processed {total_messages} messages ({rate:.0f} msg/s)\n")
+                            last_report_time, last_report_count = now, total_messages
+
+            # Save batch when we reach batch_size, or whatever is buffered once the topic goes idle
+            if row_count >= batch_size or (row_count and not batches):
+                background_writer.submit(columns)
+                columns = new_batch(schema)  # Reset for next batch
+                row_count = 0
+
+            # Commit offsets only once the file holding every consumed record is written and finalized
+            if row_count == 0 and writer.is_due():
+                background_writer.wait()
+                writer.close()
+                consumer.commit()
+
     except KeyboardInterrupt:
         print(f"\nStopping... Processed {total_messages} messages")
     finally:
-        consumer.close()
-        
-        # Save remaining transactions
-        if transactions:
-            save_parquet_batch(transactions, output_directory, topic_name, file_counter)
-            
+        try:
+            # Save remaining transactions, offsets are not committed if any write failed
+            if row_count:
+                background_writer.submit(columns)
+            background_writer.wait()
+            if writer.close():
+                consumer.commit()
+        finally:
+            background_writer.shutdown()
+            consumer.close()
+
         print(f"Total messages saved: {total_messages}")
 
-def save_parquet_batch(transactions, output_directory, topic_name, file_counter):
-    """Save a batch of transactions to Parquet file"""
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"{output_directory}/{topic_name}/{topic_name}_batch_{file_counter}_{timestamp}.parquet"
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(transactions)
-    
-    # Convert timestamp columns to datetime
-    if 'TIMESTAMP' in df.columns:
-        df['TIMESTAMP'] = pd.to_datetime(df['TIMESTAMP'])
-    if 'TIMESTAMP_OF_RECEPTION_LOG' in df.columns:
-        df['TIMESTAMP_OF_RECEPTION_LOG'] = pd.to_datetime(df['TIMESTAMP_OF_RECEPTION_LOG'])
-    
+def new_batch(schema):
+    """Create an empty column-oriented batch with one list per schema field"""
+    return {name: [] for name in schema.names}
+
+
+def parse_timestamps(values, field):
+    """Parse string timestamps to the field's timestamp type with their known format"""
+    strings = pa.array(values, pa.string())
+    fmt = TIMESTAMP_FORMATS.get(field.name)
+    if fmt is not None:
+        parsed = pc.strptime(strings, format=fmt, unit=field.type.unit)
+    else:
+        try:
+            parsed = pc.cast(strings, field.type)
+        except pa.ArrowInvalid:
+            # No UTC offset in the strings
+            parsed = pc.cast(strings, pa.timestamp(field.type.unit))
+
+    if field.type.tz is not None and parsed.type.tz is None:
+        parsed = pc.assume_timezone(parsed, field.type.tz)
+    return parsed
+
+
+def save_parquet_batch(columns, writer):
+    """Append a batch of transactions to the open Parquet file"""
+    # Build Arrow arrays column by column with the known types, no type inference
+    arrays = []
+    for field in writer.schema:
+        if pa.types.is_timestamp(field.type):
+            arrays.append(parse_timestamps(columns[field.name], field))
+        else:
+            arrays.append(pa.array(columns[field.name], type=field.type))
+    batch = pa.RecordBatch.from_arrays(arrays, schema=writer.schema)
+
     # Save to Parquet
-    df.to_parquet(filename, index=False)
-    print(f"Saved {len(transactions)} transactions to: {filename}")
+    filename = writer.write(batch)
+    print(f"Saved {batch.num_rows} transactions to: {filename}")
+
+def run_consumers(topic_name, bootstrap_servers, output_directory, batch_size=1000, num_workers=None):
+    """
+    Run one consumer process per topic partition (up to the CPU count) in the same consumer group,
+    Kafka spreads the partitions across them
+    """
+    if num_workers is None:
+        probe = KafkaConsumer(bootstrap_servers=bootstrap_servers)
+        partitions = probe.partitions_for_topic(topic_name) or {0}
+        probe.close()
+        num_workers = min(len(partitions), multiprocessing.cpu_count())
+
+    workers = []
+    for worker_id in range(num_workers):
+        worker = multiprocessing.Process(
+            target=consume_kafka_to_parquet,
+            args=(topic_name, bootstrap_servers, output_directory, batch_size),
+            kwargs={'worker_id': worker_id}
+        )
+        worker.start()
+        workers.append(worker)
+
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        # Each worker handles the interrupt itself and flushes its last file
+        for worker in workers:
+            worker.join()
 
 # Usage
 if __name__ == "__main__":
-    consume_kafka_to_parquet(
+    run_consumers(
         topic_name="TRANSACTIONS_CLEANED",
         bootstrap_servers=['localhost:9092'],
         output_directory="./data_lake",
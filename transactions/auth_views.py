@@ -146,7 +146,13 @@ class ListPermissionsView(APIView):
             username = request.query_params.get('username')
             table_name = request.query_params.get('table_name')
             
-            permissions = DataTablePermission.objects.filter(is_active=True)
+            # Join the users in the same query so serializing usernames does not query per permission
+            permissions = DataTablePermission.objects.filter(is_active=True).select_related(
+                'user', 'granted_by'
+            ).only(
+                'id', 'table_name', 'permission_type', 'granted_at', 'is_active',
+                'user__username', 'granted_by__username'
+            )
             
             if username:
                 try:
@@ -1,19 +1,116 @@
+from django.db import close_old_connections
+from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
 from .models import APIAccessLog
+import atexit
 import json
+import os
+import queue
+import threading
+import time
+
+# Access log records waiting to be written, dropped when full rather than blocking responses
+_LOG_QUEUE = queue.Queue(maxsize=10000)
+_LOG_BATCH_SIZE = 500
+_LOG_FLUSH_INTERVAL = 1.0  # seconds
+# Only the start of request bodies is kept in the access log
+MAX_LOG_BODY = 4096
+# Queued after the last record when the process exits, the drain thread writes its batch and stops
+_STOP = object()
+_drain_thread = None
+_drain_thread_pid = None
+_drain_thread_lock = threading.Lock()
+
+
+def _drain_access_logs():
+    """Write queued access logs with one bulk INSERT per batch"""
+    while True:
+        batch = [_LOG_QUEUE.get()]
+        deadline = time.monotonic() + _LOG_FLUSH_INTERVAL
+
+        # Collect up to _LOG_BATCH_SIZE records, or whatever arrived within the flush interval
+        while len(batch) < _LOG_BATCH_SIZE and batch[-1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_LOG_QUEUE.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        stopping = batch[-1] is _STOP
+        if stopping:
+            batch.pop()
+
+        if batch:
+            try:
+                APIAccessLog.objects.bulk_create([APIAccessLog(**record) for record in batch],
+                                                 batch_size=_LOG_BATCH_SIZE)
+            except Exception as e:
+                print(f"Logging error: {e}")
+            finally:
+                close_old_connections()
+
+        if stopping:
+            return
+
+
+def _start_drain_thread():
+    """
+    Start the drain thread of this process if it is not running. A thread started before a fork
+    (gunicorn --preload for instance) only runs in the parent, so each worker starts its own.
+    """
+    global _drain_thread, _drain_thread_pid
+    pid = os.getpid()
+    if _drain_thread_pid == pid and _drain_thread.is_alive():
+        return
+    with _drain_thread_lock:
+        if _drain_thread_pid != pid or not _drain_thread.is_alive():
+            _drain_thread = threading.Thread(target=_drain_access_logs, name='api-access-log', daemon=True)
+            _drain_thread.start()
+            _drain_thread_pid = pid
+
+
+# How long the process waits at exit for the queued access logs to be written, in seconds
+_EXIT_FLUSH_TIMEOUT = 10
+
+
+@atexit.register
+def _flush_access_logs():
+    """Write the queued access logs before the process exits, the daemon thread would be killed with them"""
+    if _drain_thread_pid != os.getpid() or not _drain_thread.is_alive():
+        return
+    try:
+        _LOG_QUEUE.put(_STOP, timeout=_EXIT_FLUSH_TIMEOUT)
+    except queue.Full:
+        print("Logging error: access log queue is full, dropping queued entries at exit")
+        return
+    _drain_thread.join(timeout=_EXIT_FLUSH_TIMEOUT)
+
+
+def _is_logged_path(path):
+    """Only API calls are logged (not admin, static files, etc.)"""
+    return path.startswith('/transactions/') or path.startswith('/auth/')
 
 
 class APIAccessLogMiddleware(MiddlewareMixin):
     """Middleware to log all API access"""
-    
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        _start_drain_thread()
+
     def process_request(self, request):
-        # Store request data for later use
-        request._body_data = request.body.decode('utf-8') if request.body else ''
+        # Store request data for later use, bodies only matter for logged requests that send data
+        if _is_logged_path(request.path) and request.method in ('POST', 'PUT', 'PATCH') and request.body:
+            request._body_data = request.body[:MAX_LOG_BODY].decode('utf-8', errors='replace')
+        else:
+            request._body_data = ''
         return None
-    
+
     def process_response(self, request, response):
         # Only log API calls (not admin, static files, etc.)
-        if request.path.startswith('/transactions/') or request.path.startswith('/auth/'):
+        if _is_logged_path(request.path):
             try:
                 # Get client IP
                 x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -21,20 +118,24 @@ class APIAccessLogMiddleware(MiddlewareMixin):
                     ip = x_forwarded_for.split(',')[0]
                 else:
                     ip = request.META.get('REMOTE_ADDR')
-                
-                # Create log entry
-                APIAccessLog.objects.create(
-                    user=request.user if request.user.is_authenticated else None,
-                    method=request.method,
-                    path=request.path,
-                    query_params=request.GET.urlencode(),
-                    request_body=getattr(request, '_body_data', ''),
-                    response_status=response.status_code,
-                    ip_address=ip or '127.0.0.1',
-                    user_agent=request.META.get('HTTP_USER_AGENT', '')
-                )
+
+                # Queue the log entry, it is written in bulk by the background thread
+                _start_drain_thread()
+                _LOG_QUEUE.put_nowait({
+                    'user_id': request.user.pk if request.user.is_authenticated else None,
+                    'timestamp': timezone.now(),
+                    'method': request.method,
+                    'path': request.path,
+                    'query_params': request.GET.urlencode(),
+                    'request_body': getattr(request, '_body_data', ''),
+                    'response_status': response.status_code,
+                    'ip_address': ip or '127.0.0.1',
+                    'user_agent': request.META.get('HTTP_USER_AGENT', '')
+                })
+            except queue.Full:
+                print("Logging error: access log queue is full, dropping entry")
             except Exception as e:
                 # Don't let logging errors break the response
                 print(f"Logging error: {e}")
-        
-        return response
\ No newline at end of file
+
+        return response
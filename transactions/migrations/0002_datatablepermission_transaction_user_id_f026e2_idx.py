@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-14 10:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='datatablepermission',
+            index=models.Index(fields=['user', 'table_name', 'is_active'], name='transaction_user_id_f026e2_idx'),
+        ),
+    ]
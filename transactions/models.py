@@ -20,6 +20,9 @@ class DataTablePermission(models.Model):
 
     class Meta:
         unique_together = ('user', 'table_name', 'permission_type')
+        indexes = [
+            models.Index(fields=['user', 'table_name', 'is_active']),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.table_name} - {self.permission_type}"
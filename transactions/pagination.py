@@ -1,6 +1,52 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from collections import OrderedDict
+from sqlalchemy import func, select
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+class ArrowTableRows:
+    """
+    Row sequence of an Arrow table for Django's Paginator, slicing it converts only those rows to a DataFrame
+    """
+
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def __getitem__(self, key):
+        start, stop, _ = key.indices(len(self))
+        return self.table.slice(start, max(stop - start, 0)).to_pandas()
+
+
+class SQLQueryRows:
+    """
+    Row sequence of a SQLAlchemy SELECT for Django's Paginator, its length is a COUNT(*)
+    and slicing it runs the query with LIMIT/OFFSET
+    """
+
+    def __init__(self, query, engine):
+        self.query = query
+        self.engine = engine
+        self._count = None
+
+    def __len__(self):
+        if self._count is None:
+            count_query = select(func.count()).select_from(self.query.order_by(None).subquery())
+            with self.engine.connect() as connection:
+                self._count = connection.execute(count_query).scalar()
+        return self._count
+
+    def __getitem__(self, key):
+        start, stop, _ = key.indices(len(self))
+        return pd.read_sql(self.query.limit(max(stop - start, 0)).offset(start), self.engine)
 
 
 class CustomTransactionPagination(PageNumberPagination):
@@ -8,6 +54,25 @@ class CustomTransactionPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 10
 
+    def paginate_table(self, table, request):
+        """Return the rows of the requested page of an Arrow table as a DataFrame, without converting the other rows"""
+        return self.paginate_rows(ArrowTableRows(table), request)
+
+    def paginate_rows(self, rows, request):
+        """Return the rows of the requested page from an ArrowTableRows or SQLQueryRows sequence"""
+        page_size = self.get_page_size(request)
+        paginator = self.django_paginator_class(rows, page_size)
+        page_number = self.get_page_number(request, paginator)
+
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            msg = self.invalid_page_message.format(page_number=page_number, message=str(exc))
+            raise NotFound(msg)
+
+        self.request = request
+        return self.page.object_list
+
     def get_paginated_response(self, data):
         """
         Return a paginated style `Response` object with detailed pagination info
@@ -32,3 +97,100 @@ class CustomTransactionPagination(PageNumberPagination):
             ])),
             ('results', data)
         ]))
+
+
+class TimestampCursorPagination(BasePagination):
+    """
+    Keyset pagination over records sorted by most recent TIMESTAMP first, then by TRANSACTION_ID.
+    The cursor is the (TIMESTAMP, TRANSACTION_ID) of the last record of the previous page, so a page
+    is found by comparing that key instead of counting and offsetting the records. The TRANSACTION_ID
+    keeps records sharing a TIMESTAMP (redelivered by Kafka for instance) from being skipped.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 10
+    ordering_field = 'TIMESTAMP'
+    tiebreak_field = 'TRANSACTION_ID'
+    # Sort order of the tables given to paginate_table
+    ordering = [(ordering_field, 'descending'), (tiebreak_field, 'descending')]
+
+    def paginate_table(self, table, request):
+        """Return the page of an Arrow table sorted by `ordering` that comes after the request's cursor, as a DataFrame"""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        column_type = table.schema.field(self.ordering_field).type
+        cursor = self.decode_cursor(request, column_type)
+        if cursor is not None:
+            timestamp, transaction_id = cursor
+            timestamp = pa.scalar(timestamp.as_unit('ns').value, type=pa.timestamp('ns', tz=column_type.tz))
+            ordering, tiebreak = pc.field(self.ordering_field), pc.field(self.tiebreak_field)
+            condition = ordering < timestamp
+            if transaction_id is not None:
+                condition = condition | ((ordering == timestamp) & (tiebreak < transaction_id))
+            table = table.filter(condition)
+
+        # One extra row tells whether there is a next page
+        page = table.slice(0, self.page_size + 1)
+        self.has_next = page.num_rows > self.page_size
+        page = page.slice(0, self.page_size).to_pandas()
+        self.next_cursor = self.encode_cursor(page.iloc[-1]) if self.has_next else None
+        return page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def encode_cursor(self, row):
+        return f"{row[self.ordering_field].isoformat()}|{row[self.tiebreak_field]}"
+
+    def decode_cursor(self, request, dtype):
+        """
+        (TIMESTAMP, TRANSACTION_ID) of the request's cursor, None for the first page.
+        A cursor with only a TIMESTAMP starts right before that time, TRANSACTION_ID is then None.
+        """
+        value = request.query_params.get(self.cursor_query_param)
+        if not value:
+            return None
+        timestamp, separator, transaction_id = value.partition('|')
+        if not separator:
+            transaction_id = None
+        try:
+            cursor = pd.Timestamp(timestamp)
+        except (ValueError, OverflowError):
+            raise NotFound('Invalid cursor')
+        if cursor is pd.NaT:
+            raise NotFound('Invalid cursor')
+
+        # Compare in the timezone of the column
+        column_tz = getattr(dtype, 'tz', None)
+        if column_tz is not None and cursor.tzinfo is None:
+            cursor = cursor.tz_localize(column_tz)
+        elif column_tz is None and cursor.tzinfo is not None:
+            cursor = cursor.tz_convert(None)
+        return cursor, transaction_id
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        """
+        Return a paginated style `Response` object with the cursor of the next page
+        """
+        return Response(OrderedDict([
+            ('pagination', OrderedDict([
+                ('page_size', self.page_size),
+                ('next_cursor', self.next_cursor),
+                ('next_url', self.get_next_link()),
+            ])),
+            ('results', data)
+        ]))
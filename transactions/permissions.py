@@ -17,10 +17,15 @@ class HasTablePermission(BasePermission):
         
         # Check if user has permission for 'transactions' table
         table_name = 'transactions'  # You can make this dynamic
-        
-        return DataTablePermission.objects.filter(
-            user=request.user,
-            table_name=table_name,
-            permission_type__in=['read', 'admin'],
-            is_active=True
-        ).exists()
\ No newline at end of file
+
+        # Only query the database once per request, whatever the number of checks
+        cache = request.__dict__.setdefault('_table_permission_cache', {})
+        key = (request.user.id, table_name)
+        if key not in cache:
+            cache[key] = DataTablePermission.objects.filter(
+                user_id=request.user.id,
+                table_name=table_name,
+                permission_type__in=['read', 'admin'],
+                is_active=True
+            ).exists()
+        return cache[key]
\ No newline at end of file
@@ -1,3 +1,252 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from datetime import datetime
+from sqlalchemy import Column, DateTime, MetaData, String, Table, create_engine, insert, text
+from sqlalchemy.pool import StaticPool
+from unittest import mock
+import os
+import tempfile
+import threading
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
-# Create your tests here.
+from . import middleware
+from .models import APIAccessLog
+from .pagination import TimestampCursorPagination
+from .serializers import TransactionSerializer
+from .views import (DATA_SOURCES_CACHE_TIMEOUT, BaseDatabaseTableView, ParquetTableCache, get_sql_table,
+                    serialize_transactions)
+
+
+def cursor_request(**params):
+    return Request(APIRequestFactory().get('/transactions/parquet/test/', params))
+
+
+class TimestampCursorPaginationTests(SimpleTestCase):
+    def setUp(self):
+        # A run of 4 equal timestamps straddles the page boundaries with page_size=3
+        timestamps = [7, 6, 6, 6, 6, 2, 1]
+        self.table = pa.table({
+            'TIMESTAMP': pa.array([t * 1_000_000 for t in timestamps], pa.timestamp('us', tz='UTC')),
+            'TRANSACTION_ID': [f'TXN-{i}' for i in range(len(timestamps))],
+        }).sort_by(TimestampCursorPagination.ordering)
+        self.expected_ids = self.table['TRANSACTION_ID'].to_pylist()
+
+    def paginate(self, **params):
+        paginator = TimestampCursorPagination()
+        page = paginator.paginate_table(self.table, cursor_request(**params))
+        return paginator, page['TRANSACTION_ID'].tolist()
+
+    def test_empty_cursor_returns_first_page(self):
+        paginator, ids = self.paginate(cursor='', page_size=3)
+        self.assertEqual(ids, self.expected_ids[:3])
+        self.assertIsNotNone(paginator.next_cursor)
+
+    def test_pages_through_timestamp_ties(self):
+        ids, cursor = [], ''
+        while cursor is not None:
+            paginator, page_ids = self.paginate(cursor=cursor, page_size=3)
+            ids.extend(page_ids)
+            cursor = paginator.next_cursor
+        self.assertEqual(ids, self.expected_ids)
+
+    def test_last_page_has_no_next_cursor(self):
+        paginator, _ = self.paginate(cursor='', page_size=3)
+        paginator, _ = self.paginate(cursor=paginator.next_cursor, page_size=3)
+        paginator, ids = self.paginate(cursor=paginator.next_cursor, page_size=3)
+        self.assertEqual(ids, self.expected_ids[6:])
+        self.assertIsNone(paginator.next_cursor)
+        self.assertIsNone(paginator.get_next_link())
+
+    def test_timestamp_only_cursor_starts_before_it(self):
+        _, ids = self.paginate(cursor='1970-01-01T00:00:06+00:00', page_size=3)
+        self.assertEqual(ids, self.expected_ids[5:])
+
+    def test_invalid_cursor(self):
+        for cursor in ['not-a-timestamp|TXN-1', '|TXN-1', 'not-a-timestamp']:
+            with self.assertRaises(NotFound):
+                self.paginate(cursor=cursor)
+
+
+class SerializeTransactionsTests(SimpleTestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'TRANSACTION_ID': ['TXN-1', 'TXN-2'],
+            'TIMESTAMP': pd.to_datetime(['2025-06-02T07:57:12.069757Z', '2025-06-02T07:57:12Z'], format='ISO8601'),
+            'USER_ID': ['USR-1', 'USR-2'],
+            'USER_NAME': ['Alice', None],
+            'PRODUCT_ID': ['PRD-1', 'PRD-2'],
+            'AMOUNT_USD': [12.5, 3.0],
+            'CURRENCY': pd.Categorical(['USD', 'EUR']),
+            'TRANSACTION_TYPE': ['purchase', 'refund'],
+            'STATUS': ['completed', 'pending'],
+            'LOCATION_CITY': ['Paris', 'Lyon'],
+            'LOCATION_COUNTRY': ['France', 'France'],
+            'PAYMENT_METHOD': ['card', 'paypal'],
+            'PRODUCT_CATEGORY': ['books', 'toys'],
+            'QUANTITY': [1, 2],
+            'SHIPPING_STREET': [None, None],
+            'SHIPPING_ZIP': ['75001', None],
+            'SHIPPING_CITY': [None, None],
+            'SHIPPING_COUNTRY': [None, None],
+            'DEVICE_OS': ['linux', 'ios'],
+            'DEVICE_BROWSER': ['firefox', 'safari'],
+            'DEVICE_IP_ADDRESS': ['10.0.0.1', '10.0.0.2'],
+            'CUSTOMER_RATING': [4.0, float('nan')],
+            'DISCOUNT_CODE': [None, 'SPRING'],
+            'TAX_AMOUNT': [1.25, 0.3],
+            'THREAD': [1, 2],
+            'MESSAGE_NUMBER': [10, 11],
+            'TIMESTAMP_OF_RECEPTION_LOG': pd.to_datetime(['2025-02-06 16:03:36', '2025-02-06 16:03:37']),
+        })
+
+    def serializer_data(self, df):
+        records = df.astype(object).where(df.notna(), None).to_dict('records')
+        return [dict(record) for record in TransactionSerializer(records, many=True).data]
+
+    def test_matches_transaction_serializer(self):
+        # Compared as rendered JSON so that an int rendered as a float also fails
+        self.assertEqual(JSONRenderer().render(serialize_transactions(self.df)),
+                         JSONRenderer().render(self.serializer_data(self.df)))
+
+    def test_missing_nullable_fields_are_none(self):
+        df = self.df.drop(columns=['SHIPPING_STREET', 'DISCOUNT_CODE'])
+        records = serialize_transactions(df)
+        self.assertEqual(records, self.serializer_data(df))
+        self.assertEqual([record['DISCOUNT_CODE'] for record in records], [None, None])
+
+    def test_missing_required_field_raises(self):
+        with self.assertRaises(KeyError):
+            serialize_transactions(self.df.drop(columns=['TRANSACTION_ID']))
+
+
+class ParquetTableCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.files = []
+        for i in range(70):
+            path = os.path.join(self.directory.name, f'part_{i}.parquet')
+            pq.write_table(pa.table({'AMOUNT_USD': [float(i)] * 100}), path)
+            self.files.append(path)
+        self.reads = []
+
+    def read_table(self, parquet_files):
+        self.reads.append(tuple(parquet_files))
+        return pq.read_table(parquet_files[0])
+
+    def test_reuses_tables_until_a_file_changes(self):
+        cache = ParquetTableCache(max_bytes=1 << 20)
+        for _ in range(2):
+            for path in self.files:
+                cache.get(path, [path], self.read_table)
+        self.assertEqual(len(self.reads), len(self.files))
+
+        pq.write_table(pa.table({'AMOUNT_USD': [1.0, 2.0]}), self.files[0])
+        self.assertEqual(cache.get(self.files[0], [self.files[0]], self.read_table).num_rows, 2)
+        self.assertEqual(len(self.reads), len(self.files) + 1)
+
+    def test_evicts_least_recently_used_over_budget(self):
+        table_bytes = pq.read_table(self.files[0]).nbytes
+        cache = ParquetTableCache(max_bytes=table_bytes * 2)
+        for path in self.files[:3]:
+            cache.get(path, [path], self.read_table)
+        self.assertEqual(list(cache.tables), self.files[1:3])
+        self.assertEqual(cache.nbytes, table_bytes * 2)
+
+
+class ParquetFolderViewTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        os.makedirs(os.path.join(directory.name, 'TEST_FOLDER'))
+        pq.write_table(pa.table({
+            'TRANSACTION_ID': ['TXN-1', 'TXN-2'],
+            'TIMESTAMP': pa.array([2_000_000, 1_000_000], pa.timestamp('us', tz='UTC')),
+        }), os.path.join(directory.name, 'TEST_FOLDER', 'part_0.parquet'))
+
+        patcher = mock.patch('transactions.views.get_data_lake_path', return_value=directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin', is_staff=True))
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get('/api/transactions/parquet/test_folder/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_page_returns_404(self):
+        response = self.client.get('/api/transactions/parquet/test_folder/', {'page': 5})
+        self.assertEqual(response.status_code, 404)
+
+
+class DatabaseTableRowsTests(SimpleTestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite://', poolclass=StaticPool)
+        self.table = Table('transactions', MetaData(), Column('TRANSACTION_ID', String), Column('TIMESTAMP', DateTime))
+        self.table.metadata.create_all(self.engine)
+        with self.engine.begin() as connection:
+            connection.execute(insert(self.table), [
+                {'TRANSACTION_ID': f'TXN-{i}', 'TIMESTAMP': datetime(2025, 1, 1, 0, 0, second)}
+                for i, second in enumerate([1, 2, 2, 2, 2, 3, 2])
+            ])
+
+        for patcher in [mock.patch('transactions.views.ENGINE', self.engine),
+                        mock.patch.dict('transactions.views._SQL_TABLES', clear=True)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_rows_are_ordered_by_timestamp_then_transaction_id(self):
+        view = BaseDatabaseTableView()
+        view.table_name = 'transactions'
+        rows = view.load_table_rows()
+        ids = [transaction_id for start in range(0, len(rows), 3)
+               for transaction_id in rows[start:start + 3]['TRANSACTION_ID']]
+        self.assertEqual(ids, ['TXN-5', 'TXN-6', 'TXN-4', 'TXN-3', 'TXN-2', 'TXN-1', 'TXN-0'])
+
+    def test_reloaded_tables_are_reflected_again(self):
+        self.assertNotIn('STATUS', get_sql_table('transactions').c)
+        with self.engine.begin() as connection:
+            connection.execute(text('ALTER TABLE transactions ADD COLUMN STATUS VARCHAR(64)'))
+        self.assertNotIn('STATUS', get_sql_table('transactions').c)
+
+        with mock.patch('transactions.views.time.monotonic', return_value=time.monotonic() + DATA_SOURCES_CACHE_TIMEOUT):
+            self.assertIn('STATUS', get_sql_table('transactions').c)
+
+
+class AccessLogDrainTests(TransactionTestCase):
+    def setUp(self):
+        # Stop the drain thread started by the middleware of earlier requests
+        middleware._flush_access_logs()
+
+    def access_log(self, path):
+        return {'user_id': None, 'method': 'GET', 'path': path, 'query_params': '', 'request_body': '',
+                'response_status': 200, 'ip_address': '127.0.0.1', 'user_agent': ''}
+
+    def test_thread_started_before_fork_is_replaced(self):
+        # Thread object inherited from the parent process, it does not run in this one
+        parent_thread = threading.Thread(target=lambda: None)
+        with mock.patch.multiple(middleware, _drain_thread=parent_thread, _drain_thread_pid=os.getpid() + 1):
+            middleware._start_drain_thread()
+            self.assertIsNot(middleware._drain_thread, parent_thread)
+            self.assertEqual(middleware._drain_thread_pid, os.getpid())
+            self.assertTrue(middleware._drain_thread.is_alive())
+            middleware._flush_access_logs()
+
+    def test_queued_logs_are_written_at_exit(self):
+        middleware._start_drain_thread()
+        for i in range(3):
+            middleware._LOG_QUEUE.put(self.access_log(f'/transactions/{i}/'))
+        middleware._flush_access_logs()
+
+        self.assertFalse(middleware._drain_thread.is_alive())
+        self.assertEqual(APIAccessLog.objects.count(), 3)